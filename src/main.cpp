@@ -1,11 +1,17 @@
 #include <iostream>
 #include <fstream>
 #include <sstream>
+#include <stdexcept>
 #include "../include/scanner.h"
 #include "../include/parser.h"
 #include "../include/semantic.h"
 #include "../include/codegen.h"
 
+// errores semanticos (se reportan distinto a los demas errores)
+struct SemanticErrors : std::runtime_error {
+    using std::runtime_error::runtime_error;
+};
+
 std::string readFile(const std::string& filename) {
     std::ifstream file(filename);
     if (!file.is_open()) {
@@ -24,9 +30,79 @@ void writeFile(const std::string& filename, const std::string& content) {
     file << content;
 }
 
+// compila el codigo fuente a ensamblador, reportando el progreso en log
+std::string compileSource(const std::string& source, std::ostream& log) {
+    // analisis lexico
+    log << "Performing lexical analysis..." << std::endl;
+    Scanner scanner(source);
+    std::vector<Token> tokens = scanner.tokenize();
+
+    log << "Tokens generated: " << tokens.size() << std::endl;
+
+    // analisis sintactico
+    log << "Performing syntax analysis..." << std::endl;
+    Parser parser(tokens);
+    auto program = parser.parse();
+
+    log << "Syntax analysis completed successfully." << std::endl;
+
+    // analisis semantico
+    log << "Performing semantic analysis..." << std::endl;
+    SymbolTable symbolTable;
+    SemanticAnalyzer semantic(symbolTable);
+    program->accept(&semantic);
+
+    if (semantic.hasError()) {
+        throw SemanticErrors(semantic.getErrors());
+    }
+
+    log << "Semantic analysis completed successfully." << std::endl;
+
+    // generacion de codigo
+    log << "Generating x86-64 assembly code..." << std::endl;
+    SymbolTable codegenSymbolTable;
+    CodeGenerator codegen(codegenSymbolTable);
+    codegen.enableOptimizations(true, true);
+    program->accept(&codegen);
+
+    return codegen.getCode();
+}
+
+// modo servidor: un proceso atiende muchas compilaciones sin volver a arrancar.
+// entrada: "<bytes>\n<fuente>", salida: "OK <bytes>\n<ensamblador>" o "ERR <bytes>\n<mensaje>"
+int serve() {
+    std::ostream quiet(nullptr);
+    std::string header;
+
+    while (std::getline(std::cin, header)) {
+        std::string source(std::stoul(header), '\0');
+        std::cin.read(&source[0], source.size());
+
+        std::string status = "OK";
+        std::string output;
+        try {
+            output = compileSource(source, quiet);
+        } catch (const SemanticErrors& e) {
+            status = "ERR";
+            output = std::string("Semantic errors found:\n") + e.what();
+        } catch (const std::exception& e) {
+            status = "ERR";
+            output = std::string("Error: ") + e.what() + "\n";
+        }
+
+        std::cout << status << " " << output.size() << "\n" << output << std::flush;
+    }
+    return 0;
+}
+
 int main(int argc, char* argv[]) {
+    if (argc >= 2 && std::string(argv[1]) == "--serve") {
+        return serve();
+    }
+
     if (argc < 2) {
         std::cerr << "Usage: " << argv[0] << " <input.kt> [-o output.s]\n";
+        std::cerr << "       " << argv[0] << " --serve\n";
         return 1;
     }
 
@@ -46,41 +122,7 @@ int main(int argc, char* argv[]) {
         std::cout << "Reading source file: " << inputFile << std::endl;
         std::string source = readFile(inputFile);
 
-        // analisis lexico
-        std::cout << "Performing lexical analysis..." << std::endl;
-        Scanner scanner(source);
-        std::vector<Token> tokens = scanner.tokenize();
-
-        std::cout << "Tokens generated: " << tokens.size() << std::endl;
-
-        // analisis sintactico
-        std::cout << "Performing syntax analysis..." << std::endl;
-        Parser parser(tokens);
-        auto program = parser.parse();
-
-        std::cout << "Syntax analysis completed successfully." << std::endl;
-
-        // analisis semantico
-        std::cout << "Performing semantic analysis..." << std::endl;
-        SymbolTable symbolTable;
-        SemanticAnalyzer semantic(symbolTable);
-        program->accept(&semantic);
-
-        if (semantic.hasError()) {
-            std::cerr << "Semantic errors found:\n" << semantic.getErrors();
-            return 1;
-        }
-
-        std::cout << "Semantic analysis completed successfully." << std::endl;
-
-        // generacion de codigo
-        std::cout << "Generating x86-64 assembly code..." << std::endl;
-        SymbolTable codegenSymbolTable;
-        CodeGenerator codegen(codegenSymbolTable);
-        codegen.enableOptimizations(true, true);
-        program->accept(&codegen);
-
-        std::string assemblyCode = codegen.getCode();
+        std::string assemblyCode = compileSource(source, std::cout);
 
         // escribir salida
         std::cout << "Writing assembly to: " << outputFile << std::endl;
@@ -94,6 +136,9 @@ int main(int argc, char* argv[]) {
 
         return 0;
 
+    } catch (const SemanticErrors& e) {
+        std::cerr << "Semantic errors found:\n" << e.what();
+        return 1;
     } catch (const std::exception& e) {
         std::cerr << "Error: " << e.what() << std::endl;
         return 1;
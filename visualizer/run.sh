@@ -9,21 +9,25 @@ echo "CS3402 Compiladores - UTEC"
 echo "========================================"
 echo ""
 
-# Check if compiler exists
-if [ ! -f "../compiler" ]; then
-    echo "[INFO] Compilador no encontrado. Compilando..."
-    cd ..
-    make
-    cd visualizer
-    echo "[OK] Compilador construido exitosamente"
+# Python interpreter: ./run.sh --pypy runs the server under PyPy (JIT for the simulator loop)
+PYTHON=python3
+if [ "$1" = "--pypy" ]; then
+    PYTHON=pypy3
 fi
 
+# Build the compiler (make only rebuilds it when the sources are newer than the binary)
+echo "[INFO] Verificando compilador..."
+cd ..
+make
+cd visualizer
+echo "[OK] Compilador listo"
+
 # Check if Python dependencies are installed
 echo "[INFO] Verificando dependencias de Python..."
-python3 -c "import flask" 2>/dev/null
+$PYTHON -c "import flask, flask_cors, sortedcontainers" 2>/dev/null
 if [ $? -ne 0 ]; then
     echo "[INFO] Instalando dependencias de Python..."
-    pip3 install -r requirements.txt
+    $PYTHON -m pip install -r requirements.txt
 fi
 
 echo ""
@@ -37,5 +41,10 @@ echo "Presione Ctrl+C para detener el servidor"
 echo ""
 echo "========================================"
 
-# Start the server
-python3 server.py
+# Start the server: gunicorn (threaded, keep-alive) if installed, else the Flask dev server.
+# A single worker process, since simulator sessions live in memory.
+if $PYTHON -c "import gunicorn" 2>/dev/null; then
+    exec $PYTHON -m gunicorn -w 1 -k gthread --threads 16 -b 0.0.0.0:8080 server:app
+else
+    $PYTHON server.py
+fi
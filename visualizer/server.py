@@ -1,19 +1,69 @@
 """
 Web Server for Compiler Visualizer
 Provides interactive visualization of register and stack execution
+
+Production (threaded, keep-alive):
+    gunicorn -w 1 -k gthread --threads 16 -b 0.0.0.0:8080 server:app
+Use a single worker process: simulator sessions live in this process's memory.
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request
 from flask_cors import CORS
+from collections import OrderedDict
+import atexit
+import gzip
+import hashlib
+import queue
+import select
 import subprocess
+import tempfile
+import threading
+import time
 import os
 import sys
 from simulator import X86Simulator
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # not available on PyPy; Flask's encoder is used instead
+
 app = Flask(__name__)
 CORS(app)
 
+# Response bodies larger than this are gzip-compressed for clients that accept it
+COMPRESS_MIN_BYTES = 4096
+
+def json_response(payload):
+    """Serialize a response payload with orjson (much faster than jsonify for large states)"""
+    body = None
+    if orjson is not None:
+        try:
+            body = orjson.dumps(payload)
+        except TypeError:
+            # orjson rejects ints wider than 64 bits; fall back to the stdlib encoder
+            pass
+    if body is None:
+        body = app.json.dumps(payload).encode()
+
+    # Small bodies (step deltas) go out as-is; big states and listings shrink several times
+    if len(body) > COMPRESS_MIN_BYTES and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = app.response_class(gzip.compress(body, compresslevel=5), mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+    return app.response_class(body, mimetype='application/json')
+
+# Largest source accepted by /compile
+MAX_SOURCE_BYTES = 64 * 1024
+
+# LRU cache of compile results: blake2b(source) -> (assembly, error)
+COMPILE_CACHE_SIZE = 64
+compile_cache = OrderedDict()
+compile_cache_lock = threading.Lock()
+
 # Store simulator instances per session (simplified - using global for demo)
+# session_id -> (X86Simulator, lock serializing requests on that simulator)
 simulators = {}
 
 @app.route('/')
@@ -21,57 +71,197 @@ def index():
     """Main page"""
     return render_template('index.html')
 
-@app.route('/compile', methods=['POST'])
-def compile_code():
-    """Compile C code to assembly"""
-    data = request.json
-    source_code = data.get('code', '')
-
-    # Save source code to temp file
-    temp_file = '/tmp/temp_program.c'
-    asm_file = '/tmp/temp_output.s'
-
-    with open(temp_file, 'w') as f:
+# Compiler binary (assume we're in visualizer/ subdirectory)
+COMPILER_PATH = os.path.join(os.path.dirname(__file__), '..', 'compiler')
+COMPILE_TIMEOUT = 10
+COMPILER_WORKERS = 4  # compiles that can run at the same time
+
+class ServeUnsupported(RuntimeError):
+    """The compiler binary does not answer in --serve mode (built before it existed)"""
+
+class CompilerWorker:
+    """A long-lived `compiler --serve` process reused across /compile requests,
+    so a compile does not pay for process startup every time"""
+
+    def __init__(self, compiler_path, timeout):
+        self.compiler_path = compiler_path
+        self.timeout = timeout
+        self.process = None
+        self.lock = threading.Lock()
+
+    def compile(self, source_code):
+        """Compile source_code. Returns (assembly, error); raises on timeout or worker failure"""
+        data = source_code.encode()
+        with self.lock:
+            try:
+                if self.process is None or self.process.poll() is not None:
+                    self._start()
+                self.process.stdin.write(b'%d\n' % len(data) + data)
+                status, body = self._read_response()
+            except BaseException:
+                # Never reuse a worker left mid-response; the next request starts a new one
+                self.stop()
+                raise
+
+        text = body.decode(errors='replace')
+        return (text, None) if status == b'OK' else (None, text)
+
+    def _start(self):
+        """Start the worker process and check that it speaks the --serve protocol"""
+        self.process = subprocess.Popen(
+            [self.compiler_path, '--serve'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0
+        )
+        try:
+            # An empty source gets an ERR answer; a binary without --serve exits instead
+            self.process.stdin.write(b'0\n')
+            self._read_response()
+        except (OSError, RuntimeError, ValueError) as e:
+            raise ServeUnsupported('Compiler does not support --serve') from e
+
+    def _read_response(self):
+        """Read one "OK|ERR <bytes>\\n<body>" response, giving up after self.timeout"""
+        fd = self.process.stdout.fileno()
+        deadline = time.monotonic() + self.timeout
+        buffer = b''
+        while True:
+            header_end = buffer.find(b'\n')
+            if header_end >= 0:
+                status, length = buffer[:header_end].split()
+                end = header_end + 1 + int(length)
+                if len(buffer) >= end:
+                    return status, buffer[header_end + 1:end]
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise subprocess.TimeoutExpired(self.compiler_path, self.timeout)
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise RuntimeError('Compiler worker exited unexpectedly')
+            buffer += chunk
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+class CompilerPool:
+    """A few CompilerWorkers so concurrent /compile requests run in parallel
+    instead of queueing behind one process. Workers start on first use."""
+
+    def __init__(self, size, compiler_path, timeout):
+        self.workers = [CompilerWorker(compiler_path, timeout) for _ in range(size)]
+        self.supported = True  # cleared if the compiler binary has no --serve mode
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def compile(self, source_code):
+        """Compile on the first idle worker (same contract as CompilerWorker.compile)"""
+        worker = self.idle.get()
+        try:
+            return worker.compile(source_code)
+        except ServeUnsupported:
+            self.supported = False
+            raise
+        finally:
+            self.idle.put(worker)
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+compiler_pool = CompilerPool(COMPILER_WORKERS, COMPILER_PATH, COMPILE_TIMEOUT)
+atexit.register(compiler_pool.stop)
+
+def run_compiler(source_code):
+    """Run a one-shot compiler process on source_code. Returns (assembly, error); raises on timeout"""
+    # Save source code to a per-request temp file so concurrent compiles don't clobber each other
+    with tempfile.NamedTemporaryFile('w', suffix='.c', delete=False) as f:
         f.write(source_code)
+        temp_file = f.name
+    asm_file = temp_file[:-2] + '.s'
 
-    # Get the compiler path (assume we're in visualizer/ subdirectory)
-    compiler_path = os.path.join(os.path.dirname(__file__), '..', 'compiler')
-
-    # Compile the code
     try:
         result = subprocess.run(
-            [compiler_path, temp_file, '-o', asm_file],
+            [COMPILER_PATH, temp_file, '-o', asm_file],
             capture_output=True,
             text=True,
-            timeout=10
+            timeout=COMPILE_TIMEOUT
         )
 
         if result.returncode != 0:
-            return jsonify({
-                'success': False,
-                'error': result.stderr
-            })
+            return None, result.stderr
 
         # Read the generated assembly
         with open(asm_file, 'r') as f:
-            assembly = f.read()
+            return f.read(), None
+    finally:
+        for path in (temp_file, asm_file):
+            if os.path.exists(path):
+                os.unlink(path)
 
-        return jsonify({
-            'success': True,
-            'assembly': assembly
-        })
+@app.route('/compile', methods=['POST'])
+def compile_code():
+    """Compile C code to assembly"""
+    data = request.json
+    source_code = data.get('code', '')
 
-    except subprocess.TimeoutExpired:
-        return jsonify({
+    if len(source_code.encode()) > MAX_SOURCE_BYTES:
+        return json_response({
             'success': False,
-            'error': 'Compilation timeout'
+            'error': f'Source code too large (max {MAX_SOURCE_BYTES} bytes)'
         })
-    except Exception as e:
-        return jsonify({
+
+    # Unchanged sources are served from the cache without starting the compiler
+    key = hashlib.blake2b(source_code.encode()).hexdigest()
+    with compile_cache_lock:
+        cached = compile_cache.get(key)
+        if cached is not None:
+            compile_cache.move_to_end(key)
+    if cached is None:
+        try:
+            cached = None
+            if compiler_pool.supported:
+                try:
+                    # A worker that crashes fails this request only; it is restarted next time
+                    cached = compiler_pool.compile(source_code)
+                except ServeUnsupported:
+                    pass
+            if cached is None:
+                # One-shot process (a compiler binary without --serve)
+                cached = run_compiler(source_code)
+        except subprocess.TimeoutExpired:
+            return json_response({
+                'success': False,
+                'error': 'Compilation timeout'
+            })
+        except Exception as e:
+            return json_response({
+                'success': False,
+                'error': str(e)
+            })
+        with compile_cache_lock:
+            compile_cache[key] = cached
+            if len(compile_cache) > COMPILE_CACHE_SIZE:
+                compile_cache.popitem(last=False)
+
+    assembly, error = cached
+    if error is not None:
+        return json_response({
             'success': False,
-            'error': str(e)
+            'error': error
         })
 
+    return json_response({
+        'success': True,
+        'assembly': assembly
+    })
+
 @app.route('/load_assembly', methods=['POST'])
 def load_assembly():
     """Load assembly code into simulator"""
@@ -81,9 +271,9 @@ def load_assembly():
 
     sim = X86Simulator()
     sim.load_assembly(assembly)
-    simulators[session_id] = sim
+    simulators[session_id] = (sim, threading.Lock())
 
-    return jsonify({
+    return json_response({
         'success': True,
         'state': sim.get_state(),
         'total_instructions': len(sim.instructions),
@@ -95,18 +285,29 @@ def step():
     """Execute one instruction step"""
     data = request.json
     session_id = data.get('session_id', 'default')
+    since_seq = data.get('since_seq')  # seq of the state the client already has
 
     if session_id not in simulators:
-        return jsonify({'success': False, 'error': 'No simulator loaded'})
-
-    sim = simulators[session_id]
-    can_continue = sim.step()
+        return json_response({'success': False, 'error': 'No simulator loaded'})
+
+    sim, lock = simulators[session_id]
+    with lock:
+        can_continue = sim.step()
+
+        # Send only the changes when the client's copy can be patched
+        delta = sim.get_state_delta(since_seq) if since_seq is not None else None
+        if delta is not None:
+            return json_response({
+                'success': True,
+                'delta': delta,
+                'can_continue': can_continue
+            })
 
-    return jsonify({
-        'success': True,
-        'state': sim.get_state(),
-        'can_continue': can_continue
-    })
+        return json_response({
+            'success': True,
+            'state': sim.get_state(),
+            'can_continue': can_continue
+        })
 
 @app.route('/step_back', methods=['POST'])
 def step_back():
@@ -115,15 +316,16 @@ def step_back():
     session_id = data.get('session_id', 'default')
 
     if session_id not in simulators:
-        return jsonify({'success': False, 'error': 'No simulator loaded'})
+        return json_response({'success': False, 'error': 'No simulator loaded'})
 
-    sim = simulators[session_id]
-    success = sim.step_back()
+    sim, lock = simulators[session_id]
+    with lock:
+        success = sim.step_back()
 
-    return jsonify({
-        'success': success,
-        'state': sim.get_state() if success else None
-    })
+        return json_response({
+            'success': success,
+            'state': sim.get_state() if success else None
+        })
 
 @app.route('/run', methods=['POST'])
 def run():
@@ -133,26 +335,18 @@ def run():
     breakpoint = data.get('breakpoint', -1)
 
     if session_id not in simulators:
-        return jsonify({'success': False, 'error': 'No simulator loaded'})
+        return json_response({'success': False, 'error': 'No simulator loaded'})
 
-    sim = simulators[session_id]
+    sim, lock = simulators[session_id]
+    with lock:
+        # Execute steps (bounded to prevent infinite loops)
+        steps = sim.run_to(breakpoint, max_steps=10000)
 
-    # Execute steps
-    steps = 0
-    max_steps = 10000  # Prevent infinite loops
-
-    while steps < max_steps and sim.current_instruction < len(sim.instructions):
-        if sim.current_instruction == breakpoint:
-            break
-        if not sim.step():
-            break
-        steps += 1
-
-    return jsonify({
-        'success': True,
-        'state': sim.get_state(),
-        'steps_executed': steps
-    })
+        return json_response({
+            'success': True,
+            'state': sim.get_state(),
+            'steps_executed': steps
+        })
 
 @app.route('/reset', methods=['POST'])
 def reset():
@@ -161,17 +355,16 @@ def reset():
     session_id = data.get('session_id', 'default')
 
     if session_id not in simulators:
-        return jsonify({'success': False, 'error': 'No simulator loaded'})
+        return json_response({'success': False, 'error': 'No simulator loaded'})
 
-    sim = simulators[session_id]
-    # Restore to initial state by stepping back all the way
-    while sim.step_back():
-        pass
+    sim, lock = simulators[session_id]
+    with lock:
+        sim.reset()
 
-    return jsonify({
-        'success': True,
-        'state': sim.get_state()
-    })
+        return json_response({
+            'success': True,
+            'state': sim.get_state()
+        })
 
 @app.route('/get_state', methods=['POST'])
 def get_state():
@@ -180,14 +373,14 @@ def get_state():
     session_id = data.get('session_id', 'default')
 
     if session_id not in simulators:
-        return jsonify({'success': False, 'error': 'No simulator loaded'})
-
-    sim = simulators[session_id]
+        return json_response({'success': False, 'error': 'No simulator loaded'})
 
-    return jsonify({
-        'success': True,
-        'state': sim.get_state()
-    })
+    sim, lock = simulators[session_id]
+    with lock:
+        return json_response({
+            'success': True,
+            'state': sim.get_state()
+        })
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -199,4 +392,5 @@ if __name__ == '__main__':
     print("\nPress Ctrl+C to stop the server")
     print("=" * 60)
 
-    app.run(debug=True, host='0.0.0.0', port=8080)
+    # Development server; see the module docstring for the production command
+    app.run(host='0.0.0.0', port=8080, threaded=True)
@@ -3,34 +3,133 @@ X86-64 Assembly Simulator (AT&T Syntax)
 Simulates execution of x86-64 assembly instructions step by step
 """
 
+import operator
 import re
-from typing import Dict, List, Tuple, Any
+import sys
+from collections import deque
+from functools import partial
+from itertools import islice
+from sortedcontainers import SortedList
+from typing import Dict, List, Optional, Tuple, Any
+
+# Operand patterns, compiled once at import instead of on every operand access
+_MEM_RE = re.compile(r'(-?\d+)?\(%(\w+)\)')   # offset(%reg) or (%reg)
+_RIP_RE = re.compile(r'([.\w]+)\(%rip\)')      # label(%rip)
+
+# Opcodes whose trailing q/l/w/b is a size suffix rather than part of the name
+_SUFFIXED_OPCODES = frozenset([
+    'mov', 'add', 'sub', 'imul', 'idiv', 'push', 'pop',
+    'cmp', 'test', 'xor', 'and', 'or', 'lea', 'inc', 'dec',
+    'neg', 'movzb', 'call', 'ret', 'jmp', 'cqt'
+])
+
+# Jump opcodes; their handlers expect a resolved ('label', name, target) operand
+_JUMP_OPCODES = frozenset(['jmp', 'je', 'jz', 'jne', 'jnz', 'jl', 'jle', 'jg', 'jge'])
+
+# Step-back history: undo records kept for the most recent steps, plus a full
+# snapshot every CHECKPOINT_EVERY steps to rebuild older states from. At most
+# CHECKPOINT_MAX snapshots are kept: older ones are thinned out as runs get longer
+HISTORY_MAX = 256
+CHECKPOINT_EVERY = 64
+CHECKPOINT_MAX = 32
+
+# Undo-log marker for a dict key that did not exist / a list item that was appended
+_MISSING = object()
+
+# Undo log used by run_to(): appends are discarded
+_NO_UNDO = deque(maxlen=0)
+
+# General purpose registers live in a list indexed by their position here
+REG_NAMES = ('rax', 'rbx', 'rcx', 'rdx', 'rsi', 'rdi', 'rbp', 'rsp',
+             'r8', 'r9', 'r10', 'r11', 'r12', 'r13', 'r14', 'r15',
+             'rip')  # Instruction pointer
+REG_INDEX = {name: i for i, name in enumerate(REG_NAMES)}
+RAX, RDX, RSI, RBP, RSP = (REG_INDEX[name] for name in ('rax', 'rdx', 'rsi', 'rbp', 'rsp'))
+
+# Value masks for register writes: 64-bit names, and 32-bit (and 8-bit) names,
+# which zero-extend into the full register
+MASK64 = 0xFFFFFFFFFFFFFFFF
+MASK32 = 0xFFFFFFFF
+
+# 32-bit and 8-bit register names -> the 64-bit register they are part of
+_REG_TO_64 = {
+    'eax': 'rax', 'ebx': 'rbx', 'ecx': 'rcx', 'edx': 'rdx',
+    'esi': 'rsi', 'edi': 'rdi', 'ebp': 'rbp', 'esp': 'rsp',
+    'r8d': 'r8', 'r9d': 'r9', 'r10d': 'r10', 'r11d': 'r11',
+    'r12d': 'r12', 'r13d': 'r13', 'r14d': 'r14', 'r15d': 'r15',
+    # 8-bit registers
+    'al': 'rax', 'bl': 'rbx', 'cl': 'rcx', 'dl': 'rdx',
+    'sil': 'rsi', 'dil': 'rdi',
+}
+
+# Flags are bits of one int stored right after the registers in the same list,
+# so they share the register undo log and snapshots
+FLAGS = len(REG_NAMES)
+ZF, SF, CF, OF = 1, 2, 4, 8  # Zero, sign, carry, overflow
+FLAG_BITS = (('ZF', ZF), ('SF', SF), ('CF', CF), ('OF', OF))
+
+# Condition codes as 0/1 functions of the flags, shared by the jcc and setcc
+# handlers. Signed "less" is SF != OF: bit 1 (SF) xor bit 3 (OF); ZF is bit 0.
+
+def _cond_e(flags):
+    return flags & ZF
+
+def _cond_ne(flags):
+    return (flags & ZF) ^ 1
+
+def _cond_l(flags):
+    return ((flags >> 1) ^ (flags >> 3)) & 1
+
+def _cond_le(flags):
+    return (flags | (flags >> 1) ^ (flags >> 3)) & 1
+
+def _cond_g(flags):
+    return ((flags | (flags >> 1) ^ (flags >> 3)) & 1) ^ 1
+
+def _cond_ge(flags):
+    return (((flags >> 1) ^ (flags >> 3)) & 1) ^ 1
+
+# Numeric data directives -> type of the value they hold
+_DATA_TYPES = {'.double': float, '.long': int, '.int': int, '.quad': int}
+
+def _parse_data(data):
+    """Value of a data section entry such as ".double 3.14" (numbers parsed, anything else kept as text)"""
+    parts = data.split(None, 1)
+    parse = _DATA_TYPES.get(parts[0]) if len(parts) == 2 else None
+    if parse is not None:
+        try:
+            return parse(parts[1])
+        except ValueError:
+            pass
+    return data
+
+def _format_register(value):
+    """Registers are shown in hex; float values kept for simulation are shown as-is"""
+    return hex(value) if isinstance(value, int) else value
 
 class X86Simulator:
+    # Fixed attribute layout: no per-instance __dict__, attribute access in the
+    # step loop goes through slot descriptors
+    __slots__ = (
+        'reg', 'xmm_registers', 'memory', 'stack', '_stack_addrs',
+        'data_section', 'labels', 'instructions', 'decoded', 'compiled', 'instruction_lines',
+        'current_instruction', 'history', '_undo', 'step_count', 'checkpoints',
+        'state_seq', '_delta_base_seq', 'call_stack', 'variables', 'output', '_initial',
+        '_state_cache',
+    )
+
     def __init__(self):
-        # 64-bit registers
-        self.registers = {
-            'rax': 0, 'rbx': 0, 'rcx': 0, 'rdx': 0,
-            'rsi': 0, 'rdi': 0, 'rbp': 0, 'rsp': 0x7fff_ffff_fff0,
-            'r8': 0, 'r9': 0, 'r10': 0, 'r11': 0,
-            'r12': 0, 'r13': 0, 'r14': 0, 'r15': 0,
-            'rip': 0  # Instruction pointer
-        }
+        # 64-bit registers, indexed by REG_INDEX, followed by the flag bits
+        self.reg = [0] * (len(REG_NAMES) + 1)
+        self.reg[RSP] = 0x7fff_ffff_fff0
 
         # SSE registers for floating point
         self.xmm_registers = {f'xmm{i}': 0.0 for i in range(16)}
 
-        # Flags
-        self.flags = {
-            'ZF': 0,  # Zero flag
-            'SF': 0,  # Sign flag
-            'CF': 0,  # Carry flag
-            'OF': 0   # Overflow flag
-        }
-
         # Memory (simplified - using dict)
         self.memory = {}
         self.stack = {}  # Stack memory
+        self._stack_addrs = SortedList()  # Keys of self.stack, kept in order for get_state()
 
         # Data section
         self.data_section = {}
@@ -40,11 +139,22 @@ class X86Simulator:
 
         # Instructions list
         self.instructions = []
+        self.decoded = []  # (opcode id, operand descriptors) per instruction, parsed once at load time
+        self.compiled = []  # Zero-argument callable per instruction, built from decoded (see _compile)
         self.instruction_lines = []  # Map instruction index to original line number
         self.current_instruction = 0
 
-        # Execution history for stepping backward
-        self.history = []
+        # Execution history for stepping backward: one (instruction, undo record) per step
+        self.history = deque(maxlen=HISTORY_MAX)
+        self._undo = []  # Undo record of the step being executed
+        self.step_count = 0  # Steps executed since the initial state
+        self.checkpoints = {}  # step_count -> snapshot
+
+        # State version for incremental updates: bumped on every step, step back and reset.
+        # Deltas can only be computed across forward steps taken after _delta_base_seq.
+        self.state_seq = 0
+        self._delta_base_seq = 0
+        self._state_cache = None  # (state_seq, get_state() result)
 
         # Call stack for function tracking
         self.call_stack = []
@@ -55,10 +165,14 @@ class X86Simulator:
         # Program output (captured from printf calls)
         self.output = []
 
+        # State that reset() returns to (refreshed by load_assembly)
+        self._initial = self._snapshot()
+
     def load_assembly(self, assembly_code: str):
         """Load assembly code and parse it"""
         lines = assembly_code.strip().split('\n')
         self.instructions = []
+        self.decoded = []
         self.instruction_lines = []
         self.labels = {}
         in_data_section = False
@@ -83,15 +197,14 @@ class X86Simulator:
             if in_data_section:
                 if ':' in line:
                     parts = line.split(':', 1)
-                    label = parts[0].strip()
+                    label = sys.intern(parts[0].strip())
                     if len(parts) > 1:
-                        data = parts[1].strip()
-                        self.data_section[label] = data
+                        self.data_section[label] = _parse_data(parts[1].strip())
                 continue
 
             # Handle labels
             if line.endswith(':'):
-                label = line[:-1].strip()
+                label = sys.intern(line[:-1].strip())
                 self.labels[label] = instruction_index
                 continue
 
@@ -100,56 +213,179 @@ class X86Simulator:
             self.instruction_lines.append(original_line_index)
             instruction_index += 1
 
+        # Decode once all labels are known so jump targets can be resolved
+        self.decoded = []
+        for line in self.instructions:
+            opcode, operands = self.decode_instruction(line)
+            self.decoded.append((self._opcode_id(opcode, operands), operands))
+        self.compiled = [self._compile(opcode_id, operands) for opcode_id, operands in self.decoded]
+
         # Start at main if it exists, otherwise start at 0
         self.current_instruction = self.labels.get('main', 0)
 
-    def save_state(self):
-        """Save current state to history"""
-        state = {
-            'registers': self.registers.copy(),
+        # Initial state, restored directly by reset()
+        self.history.clear()
+        self.step_count = 0
+        self._initial = self._snapshot()
+        self.checkpoints = {0: self._initial}
+        self._invalidate_deltas()
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """Copy the complete mutable execution state"""
+        return {
+            'reg': self.reg.copy(),
             'xmm_registers': self.xmm_registers.copy(),
-            'flags': self.flags.copy(),
             'stack': self.stack.copy(),
-            'memory': self.memory.copy(),
             'current_instruction': self.current_instruction,
             'call_stack': self.call_stack.copy(),
             'output': self.output.copy()
         }
-        self.history.append(state)
+
+    def _restore(self, snapshot: Dict[str, Any]):
+        """Restore a snapshot in place (undo records keep pointing at the same containers)"""
+        self.reg[:] = snapshot['reg']
+        for name in ('xmm_registers', 'stack'):
+            target = getattr(self, name)
+            target.clear()
+            target.update(snapshot[name])
+        self._stack_addrs = SortedList(self.stack)
+        self.call_stack[:] = snapshot['call_stack']
+        self.output[:] = snapshot['output']
+        self.current_instruction = snapshot['current_instruction']
+
+    def reset(self):
+        """Return to the state right after load_assembly and drop the history"""
+        self._restore(self._initial)
+        self.history.clear()
+        self.step_count = 0
+        self._invalidate_deltas()
+
+    def _invalidate_deltas(self):
+        """Record a change that get_state_delta() cannot express (step back, reset, reload)"""
+        self.state_seq += 1
+        self._delta_base_seq = self.state_seq
+
+    def _checkpoint(self):
+        """Take the periodic full snapshot step_back rebuilds older states from"""
+        if self.step_count % CHECKPOINT_EVERY == 0 and self.step_count not in self.checkpoints:
+            self.checkpoints[self.step_count] = self._snapshot()
+            if len(self.checkpoints) > CHECKPOINT_MAX:
+                self._thin_checkpoints()
+
+    def _thin_checkpoints(self):
+        """Drop every other checkpoint, keeping step 0 and the newest one, so
+        older states are rebuilt from further back instead of using more memory"""
+        steps = sorted(self.checkpoints)
+        for n in steps[1:-1:2]:
+            del self.checkpoints[n]
+
+    def save_state(self):
+        """Start a new undo record for the next step"""
+        self._checkpoint()
+        self._undo = []
+        self.history.append((self.current_instruction, self._undo))
+        self.step_count += 1
+        self.state_seq += 1
 
     def restore_state(self):
-        """Restore previous state from history"""
+        """Undo the most recent step (or run_to() call) by replaying its undo record"""
         if not self.history:
             return False
 
-        state = self.history.pop()
-        self.registers = state['registers']
-        self.xmm_registers = state['xmm_registers']
-        self.flags = state['flags']
-        self.stack = state['stack']
-        self.memory = state['memory']
-        self.current_instruction = state['current_instruction']
-        self.call_stack = state['call_stack']
-        self.output = state['output']
+        current_instruction, record = self.history.pop()
+        if isinstance(record, dict):
+            # Snapshot taken before a run_to(): undo the whole run
+            self._restore(record)
+            self.step_count = record['step_count']
+            self._invalidate_deltas()
+            return True
+
+        for target, key, old in reversed(record):
+            if key is None:
+                # List append/pop
+                if old is _MISSING:
+                    target.pop()
+                else:
+                    target.append(old)
+            elif old is _MISSING:
+                del target[key]
+                if target is self.stack:
+                    self._stack_addrs.remove(key)
+            else:
+                target[key] = old
+        self.current_instruction = current_instruction
+        self.step_count -= 1
+        self._invalidate_deltas()
+        return True
+
+    def set_history_limit(self, limit: int):
+        """Keep undo records for at most the last limit steps; stepping back
+        further rebuilds from the checkpoints"""
+        self.history = deque(self.history, maxlen=limit)
+
+    def _rebuild_previous_state(self) -> bool:
+        """Step back past the end of the bounded history: restore the nearest
+        checkpoint and execute forward to one step before the current one"""
+        target = self.step_count - 1
+        if target < 0:
+            return False
+
+        start = max(n for n in self.checkpoints if n <= target)
+        self._restore(self.checkpoints[start])
+        self.history.clear()
+        self.step_count = start
+        while self.step_count < target and self.current_instruction < len(self.instructions):
+            self.step()
+        self._invalidate_deltas()
         return True
 
+    @property
+    def registers(self) -> Dict[str, Any]:
+        """Register file as a name -> value dict (a copy, not a live view)"""
+        return dict(zip(REG_NAMES, self.reg))
+
+    @property
+    def flags(self) -> Dict[str, int]:
+        """Flags as a name -> 0/1 dict (a copy, not a live view)"""
+        bits = self.reg[FLAGS]
+        return {name: 1 if bits & bit else 0 for name, bit in FLAG_BITS}
+
+    def _set_reg(self, index: int, value):
+        """Set a register by index, logging the previous value for step_back"""
+        self._undo.append((self.reg, index, self.reg[index]))
+        self.reg[index] = value
+
+    def _write(self, target: dict, key, value):
+        """Set target[key], logging the previous value for step_back"""
+        self._undo.append((target, key, target.get(key, _MISSING)))
+        target[key] = value
+
+    def _store(self, addr, value):
+        """Write a stack slot, keeping the sorted address index up to date"""
+        stack = self.stack
+        old = stack.get(addr, _MISSING)
+        if old is _MISSING:
+            self._stack_addrs.add(addr)
+        self._undo.append((stack, addr, old))
+        stack[addr] = value
+
+    def _append(self, target: list, value):
+        """Append to a state list, logging it for step_back"""
+        self._undo.append((target, None, _MISSING))
+        target.append(value)
+
+    def _pop(self, target: list):
+        """Pop from a state list, logging the removed item for step_back"""
+        value = target.pop()
+        self._undo.append((target, None, value))
+        return value
+
     def parse_register(self, reg: str) -> str:
         """Parse AT&T register (remove % prefix) and normalize to 64-bit"""
         reg = reg.strip()
         if reg.startswith('%'):
             reg = reg[1:]
-
-        # Convert 32-bit to 64-bit
-        reg32_to_64 = {
-            'eax': 'rax', 'ebx': 'rbx', 'ecx': 'rcx', 'edx': 'rdx',
-            'esi': 'rsi', 'edi': 'rdi', 'ebp': 'rbp', 'esp': 'rsp',
-            'r8d': 'r8', 'r9d': 'r9', 'r10d': 'r10', 'r11d': 'r11',
-            'r12d': 'r12', 'r13d': 'r13', 'r14d': 'r14', 'r15d': 'r15',
-            # 8-bit registers
-            'al': 'rax', 'bl': 'rbx', 'cl': 'rcx', 'dl': 'rdx',
-            'sil': 'rsi', 'dil': 'rdi',
-        }
-        return reg32_to_64.get(reg, reg)
+        return _REG_TO_64.get(reg, reg)
 
     def parse_immediate(self, imm: str) -> int:
         """Parse AT&T immediate value (remove $ prefix)"""
@@ -158,100 +394,101 @@ class X86Simulator:
             imm = imm[1:]
         return int(imm)
 
-    def get_address(self, operand: str) -> int:
-        """Parse memory operand and return the address"""
-        operand = operand.strip()
-        match = re.match(r'(-?\d+)?\(%(\w+)\)', operand)
-        if match:
-            offset_str, reg = match.groups()
-            offset = int(offset_str) if offset_str else 0
-            reg = self.parse_register('%' + reg)
-            return self.registers.get(reg, 0) + offset
-        return 0
-
-    def get_value(self, operand: str) -> int:
-        """Get value from operand (register, memory, or immediate) - AT&T syntax"""
+    def parse_operand(self, operand: str) -> Tuple:
+        """Classify an AT&T operand into a descriptor tuple:
+        ('imm', value), ('reg', index, write_mask), ('xmm', name),
+        ('mem', base_index, offset), ('rip', label), ('label', name, target_index)
+        or ('none',). Label targets are resolved against the labels loaded so far
+        (-1 if unknown)."""
         operand = operand.strip()
 
         # Immediate value with $ prefix
         if operand.startswith('$'):
-            return self.parse_immediate(operand)
+            try:
+                return ('imm', self.parse_immediate(operand))
+            except ValueError:
+                try:
+                    return ('imm', float(operand[1:]))
+                except ValueError:
+                    return ('imm', 0)
 
         # Register with % prefix
         if operand.startswith('%'):
+            name = operand[1:]
+            if name.startswith('xmm'):
+                return ('xmm', sys.intern(name))
             reg = self.parse_register(operand)
-            if reg in self.registers:
-                return self.registers[reg]
-            return 0
+            if reg in REG_INDEX:
+                # 32-bit (and 8-bit) names zero-extend when written
+                return ('reg', REG_INDEX[reg], MASK32 if name != reg and not name.startswith('r') else MASK64)
+            return ('none',)
 
         # Memory reference: offset(%reg) or (%reg)
-        # Pattern: optional_offset(%reg)
-        match = re.match(r'(-?\d+)?\(%(\w+)\)', operand)
+        match = _MEM_RE.match(operand)
         if match:
             offset_str, reg = match.groups()
             offset = int(offset_str) if offset_str else 0
-            reg = self.parse_register('%' + reg)
-            addr = self.registers.get(reg, 0) + offset
-            return self.stack.get(addr, 0)
+            return ('mem', REG_INDEX.get(_REG_TO_64.get(reg, reg)), offset)
 
         # Label with RIP-relative: label(%rip)
-        match = re.match(r'([.\w]+)\(%rip\)', operand)
+        match = _RIP_RE.match(operand)
         if match:
-            label = match.group(1)
-            return 0  # Placeholder for data section
+            return ('rip', sys.intern(match.group(1)))
 
         # Plain number (shouldn't happen in AT&T but handle it)
         if operand.lstrip('-').isdigit():
-            return int(operand)
-
-        return 0
+            return ('imm', int(operand))
 
-    def set_value(self, operand: str, value):
-        """Set value to operand (register or memory) - AT&T syntax"""
-        operand = operand.strip()
+        # Jump/call target
+        return ('label', sys.intern(operand), self.labels.get(operand, -1))
 
-        # Register with % prefix
-        if operand.startswith('%'):
-            reg = self.parse_register(operand)
-            if reg in self.registers:
-                # Handle float values (preserve them for simulation)
-                if isinstance(value, float):
-                    self.registers[reg] = value
-                    return
-                # For 32-bit registers, zero-extend
-                if operand[1:] != reg and not operand[1:].startswith('r'):
-                    value = value & 0xFFFFFFFF
-                self.registers[reg] = value & 0xFFFFFFFFFFFFFFFF
-                return
+    def get_address(self, operand: Tuple) -> int:
+        """Return the address a memory operand descriptor refers to"""
+        if operand[0] != 'mem':
+            return 0
+        base = operand[1]
+        return (self.reg[base] if base is not None else 0) + operand[2]
+
+    def get_value(self, operand: Tuple) -> int:
+        """Get value from an operand descriptor (register, memory, or immediate)"""
+        kind = operand[0]
+        if kind == 'reg':
+            return self.reg[operand[1]]
+        if kind == 'imm':
+            return operand[1]
+        if kind == 'mem':
+            base = operand[1]
+            return self.stack.get((self.reg[base] if base is not None else 0) + operand[2], 0)
+        # RIP-relative data is a placeholder; labels and unknown registers read as 0
+        return 0
 
-        # Memory reference: offset(%reg) or (%reg)
-        match = re.match(r'(-?\d+)?\(%(\w+)\)', operand)
-        if match:
-            offset_str, reg = match.groups()
-            offset = int(offset_str) if offset_str else 0
-            reg = self.parse_register('%' + reg)
-            addr = self.registers.get(reg, 0) + offset
-            self.stack[addr] = value
-            return
+    def set_value(self, operand: Tuple, value):
+        """Set value to an operand descriptor (register or memory)"""
+        kind = operand[0]
+        if kind == 'reg':
+            # Float values are preserved as-is for simulation
+            self._set_reg(operand[1], value if isinstance(value, float) else value & operand[2])
+        elif kind == 'mem':
+            base = operand[1]
+            self._store((self.reg[base] if base is not None else 0) + operand[2], value)
 
     def strip_suffix(self, opcode: str) -> str:
         """Remove size suffix from opcode (q, l, w, b)"""
         if opcode and opcode[-1] in 'qlwb' and len(opcode) > 1:
             # Don't strip if it's part of the instruction name
             base = opcode[:-1]
-            if base in ['mov', 'add', 'sub', 'imul', 'idiv', 'push', 'pop',
-                       'cmp', 'test', 'xor', 'and', 'or', 'lea', 'inc', 'dec',
-                       'neg', 'movzb', 'call', 'ret', 'jmp', 'cqt']:
+            if base in _SUFFIXED_OPCODES:
                 return base
         return opcode
 
-    def execute_instruction(self, instruction: str) -> bool:
-        """Execute a single instruction (AT&T syntax). Returns False if execution should stop."""
+    def decode_instruction(self, instruction: str) -> Tuple[str, List[Tuple]]:
+        """Split an instruction into its normalized opcode and operand descriptors"""
         parts = instruction.split(None, 1)
         if not parts:
-            return True
+            return '', []
 
-        opcode = self.strip_suffix(parts[0].lower())
+        # Interned so dispatch and xmm/label lookups hash once and compare by identity
+        opcode = sys.intern(self.strip_suffix(parts[0].lower()))
         operands_str = parts[1] if len(parts) > 1 else ''
 
         # Parse operands (handle commas inside parentheses)
@@ -273,303 +510,469 @@ class X86Simulator:
             if current.strip():
                 operands.append(current.strip())
 
-        # AT&T syntax: src, dest (opposite of Intel)
-        # MOV instruction (skip if xmm registers involved - handled in SSE section)
-        if opcode == 'mov' and '%xmm' not in operands_str:
-            src, dest = operands[0], operands[1]
-            value = self.get_value(src)
-            self.set_value(dest, value)
-
-        # PUSH instruction
-        elif opcode == 'push':
-            value = self.get_value(operands[0])
-            self.registers['rsp'] -= 8
-            self.stack[self.registers['rsp']] = value
-
-        # POP instruction
-        elif opcode == 'pop':
-            value = self.stack.get(self.registers['rsp'], 0)
-            self.set_value(operands[0], value)
-            self.registers['rsp'] += 8
-
-        # ADD instruction (AT&T: src, dest -> dest = dest + src)
-        elif opcode == 'add':
-            src, dest = operands[0], operands[1]
-            val1 = self.get_value(dest)
-            val2 = self.get_value(src)
-            result = val1 + val2
-            self.set_value(dest, result)
-
-        # SUB instruction (AT&T: src, dest -> dest = dest - src)
-        elif opcode == 'sub':
-            src, dest = operands[0], operands[1]
-            val1 = self.get_value(dest)
-            val2 = self.get_value(src)
-            result = val1 - val2
-            self.set_value(dest, result)
-
-        # IMUL instruction (AT&T: src, dest -> dest = dest * src)
-        elif opcode == 'imul':
-            src, dest = operands[0], operands[1]
-            val1 = self.get_value(dest)
-            val2 = self.get_value(src)
-            result = val1 * val2
-            self.set_value(dest, result)
-
-        # IDIV instruction
-        elif opcode == 'idiv':
-            divisor = self.get_value(operands[0])
-            if divisor != 0:
-                dividend = self.registers['rax']
-                self.registers['rax'] = dividend // divisor
-                self.registers['rdx'] = dividend % divisor
-
-        # INC instruction
-        elif opcode == 'inc':
-            val = self.get_value(operands[0])
-            self.set_value(operands[0], val + 1)
-
-        # DEC instruction
-        elif opcode == 'dec':
-            val = self.get_value(operands[0])
-            self.set_value(operands[0], val - 1)
-
-        # NEG instruction
-        elif opcode == 'neg':
-            val = self.get_value(operands[0])
-            self.set_value(operands[0], -val)
-
-        # CMP instruction (AT&T: src, dest -> compares dest - src)
-        elif opcode == 'cmp':
-            src, dest = operands[0], operands[1]
-            val1 = self.get_value(dest)
-            val2 = self.get_value(src)
-            result = val1 - val2
-            self.flags['ZF'] = 1 if result == 0 else 0
-            self.flags['SF'] = 1 if result < 0 else 0
-            self.flags['CF'] = 1 if val1 < val2 else 0
-
-        # TEST instruction
-        elif opcode == 'test':
-            src, dest = operands[0], operands[1]
-            val1 = self.get_value(dest)
-            val2 = self.get_value(src)
-            result = val1 & val2
-            self.flags['ZF'] = 1 if result == 0 else 0
-            self.flags['SF'] = 1 if result < 0 else 0
-
-        # Jumps
-        elif opcode in ['jmp', 'je', 'jz', 'jne', 'jnz', 'jl', 'jle', 'jg', 'jge']:
-            label = operands[0]
-            should_jump = False
-
-            if opcode == 'jmp':
-                should_jump = True
-            elif opcode in ['je', 'jz']:
-                should_jump = self.flags['ZF'] == 1
-            elif opcode in ['jne', 'jnz']:
-                should_jump = self.flags['ZF'] == 0
-            elif opcode == 'jl':
-                should_jump = self.flags['SF'] != self.flags['OF']
-            elif opcode == 'jle':
-                should_jump = self.flags['ZF'] == 1 or self.flags['SF'] != self.flags['OF']
-            elif opcode == 'jg':
-                should_jump = self.flags['ZF'] == 0 and self.flags['SF'] == self.flags['OF']
-            elif opcode == 'jge':
-                should_jump = self.flags['SF'] == self.flags['OF']
-
-            if should_jump and label in self.labels:
-                self.current_instruction = self.labels[label] - 1
-
-        # CALL instruction
-        elif opcode == 'call':
-            label = operands[0]
-            # Push return address
-            self.registers['rsp'] -= 8
-            self.stack[self.registers['rsp']] = self.current_instruction + 1
-            self.call_stack.append(label)
-
-            # Capture printf output
-            # Capture printf output
-            if label == 'printf' or label == 'printf@PLT':
-                # Check if float (num vector args in %eax)
-                num_vector_args = self.registers.get('rax', 0)
-                
-                if num_vector_args >= 1:
-                     value = self.xmm_registers.get('xmm0', 0.0)
-                     self.output.append(f"{value:.6f}")
-                else:
-                    value = self.registers.get('rsi', 0)
-                    # Handle signed 64-bit values
-                    if value > 0x7FFFFFFFFFFFFFFF:
-                        value = value - 0x10000000000000000
-                    elif value > 0x7FFFFFFF and value <= 0xFFFFFFFF:
-                        value = value - 0x100000000
-                    self.output.append(str(value))
-
-            if label in self.labels:
-                self.current_instruction = self.labels[label] - 1
-
-        # RET instruction
-        elif opcode == 'ret':
-            if self.call_stack:
-                self.call_stack.pop()
-            return_addr = self.stack.get(self.registers['rsp'], 0)
-            self.registers['rsp'] += 8
-            if return_addr == 0:
-                return False
-            self.current_instruction = return_addr - 1
-
-        # LEAVE instruction
-        elif opcode == 'leave':
-            # mov %rbp, %rsp
-            self.registers['rsp'] = self.registers['rbp']
-            # pop %rbp
-            self.registers['rbp'] = self.stack.get(self.registers['rsp'], 0)
-            self.registers['rsp'] += 8
-
-        # LEA instruction (AT&T: src, dest)
-        elif opcode == 'lea':
-            src, dest = operands[0], operands[1]
-            # Handle offset(%reg)
-            match = re.match(r'(-?\d+)?\(%(\w+)\)', src)
-            if match:
-                offset_str, reg = match.groups()
-                offset = int(offset_str) if offset_str else 0
-                reg = self.parse_register('%' + reg)
-                addr = self.registers.get(reg, 0) + offset
-                self.set_value(dest, addr)
-            # Handle label(%rip)
-            elif '(%rip)' in src:
-                self.set_value(dest, 0x1000)  # Fake address for strings
-
-        # Set instructions
-        elif opcode in ['setl', 'setle', 'setg', 'setge', 'sete', 'setne', 'setz']:
-            dest = operands[0]
-            result = 0
-
-            if opcode == 'setl':
-                result = 1 if self.flags['SF'] != self.flags['OF'] else 0
-            elif opcode == 'setle':
-                result = 1 if self.flags['ZF'] == 1 or self.flags['SF'] != self.flags['OF'] else 0
-            elif opcode == 'setg':
-                result = 1 if self.flags['ZF'] == 0 and self.flags['SF'] == self.flags['OF'] else 0
-            elif opcode == 'setge':
-                result = 1 if self.flags['SF'] == self.flags['OF'] else 0
-            elif opcode in ['sete', 'setz']:
-                result = 1 if self.flags['ZF'] == 1 else 0
-            elif opcode == 'setne':
-                result = 1 if self.flags['ZF'] == 0 else 0
-
-            self.set_value(dest, result)
-
-        # MOVZB - move with zero extension (AT&T: movzbq %al, %rax)
-        elif opcode == 'movzb':
-            src, dest = operands[0], operands[1]
-            value = self.get_value(src) & 0xFF
-            self.set_value(dest, value)
-
-        # CQT/CQTO - sign extension (AT&T name for cqo)
-        elif opcode in ['cqt', 'cqto', 'cltq']:
-            if self.registers['rax'] < 0:
-                self.registers['rdx'] = -1
-            else:
-                self.registers['rdx'] = 0
-
-        # XOR instruction (AT&T: src, dest)
-        elif opcode == 'xor':
-            src, dest = operands[0], operands[1]
-            val1 = self.get_value(dest)
-            val2 = self.get_value(src)
-            result = val1 ^ val2
-            self.set_value(dest, result)
-            self.flags['ZF'] = 1 if result == 0 else 0
-
-        # AND instruction (AT&T: src, dest)
-        elif opcode == 'and':
-            src, dest = operands[0], operands[1]
-            val1 = self.get_value(dest)
-            val2 = self.get_value(src)
-            result = val1 & val2
-            self.set_value(dest, result)
-
-        # OR instruction (AT&T: src, dest)
-        elif opcode == 'or':
-            src, dest = operands[0], operands[1]
-            val1 = self.get_value(dest)
-            val2 = self.get_value(src)
-            result = val1 | val2
-            self.set_value(dest, result)
-
-        # SSE instructions (simplified)
-        elif opcode.startswith('movsd') or (opcode in ['mov', 'movq'] and '%xmm' in operands_str):
-            src, dest = operands[0], operands[1]
-            val = 0.0
-
-            # Get source value
-            if '%xmm' in src:
-                reg = src.replace('%', '')
-                val = self.xmm_registers.get(reg, 0.0)
-            elif '(%rip)' in src:
-                # Load from data section
-                label = src.split('(')[0]
-                if label in self.data_section:
-                    data_str = self.data_section[label]
-                    if '.double' in data_str:
-                        try:
-                            val = float(data_str.replace('.double', '').strip())
-                        except:
-                            pass
-                    elif '.long' in data_str or '.int' in data_str:
-                         try:
-                            val = float(data_str.replace('.long', '').replace('.int', '').strip())
-                         except:
-                            pass
-            elif src.startswith('$'):
-                # Immediate
-                try:
-                    val = float(src.replace('$', ''))
-                except:
-                    pass
-            elif re.match(r'-?\d+\(%\w+\)', src):
-                # Memory reference like -8(%rbp)
-                addr = self.get_address(src)
-                val = self.stack.get(addr, 0.0)
-            elif '%' in src: # GPR
-                reg = self.parse_register(src)
-                val = self.registers.get(reg, 0)
-
-            # Store to dest
-            if '%xmm' in dest:
-                reg = dest.replace('%', '')
-                self.xmm_registers[reg] = float(val) if not isinstance(val, float) else val
-            elif re.match(r'-?\d+\(%\w+\)', dest):
-                # Memory reference like -8(%rbp)
-                addr = self.get_address(dest)
-                self.stack[addr] = val
-            elif '%' in dest: # GPR - preserve float value for simulation purposes
-                reg = self.parse_register(dest)
-                self.registers[reg] = val
-
-        elif opcode in ['addsd', 'subsd', 'mulsd', 'divsd']:
-            src, dest = operands[0], operands[1]
-            src_reg = src.replace('%', '')
-            dest_reg = dest.replace('%', '')
-
-            val1 = self.xmm_registers.get(dest_reg, 0.0)
-            val2 = self.xmm_registers.get(src_reg, 0.0)
-
-            if opcode == 'addsd':
-                self.xmm_registers[dest_reg] = val1 + val2
-            elif opcode == 'subsd':
-                self.xmm_registers[dest_reg] = val1 - val2
-            elif opcode == 'mulsd':
-                self.xmm_registers[dest_reg] = val1 * val2
-            elif opcode == 'divsd':
-                if val2 != 0:
-                    self.xmm_registers[dest_reg] = val1 / val2
+        # Moves touching xmm registers are handled by the SSE path
+        if opcode == 'mov' and '%xmm' in operands_str:
+            opcode = 'movq'
 
-        return True
+        return opcode, [self.parse_operand(op) for op in operands]
+
+    def execute_instruction(self, instruction: str) -> bool:
+        """Execute a single instruction (AT&T syntax). Returns False if execution should stop."""
+        opcode, operands = self.decode_instruction(instruction)
+        return self.execute_decoded(opcode, operands)
+
+    def execute_decoded(self, opcode: str, operands: List[Tuple]) -> bool:
+        """Execute an already decoded instruction. Returns False if execution should stop."""
+        # Not a recorded step: cached state and deltas no longer apply
+        self._invalidate_deltas()
+        return self._HANDLERS[self._opcode_id(opcode, operands)](self, operands) is not False
+
+    def _opcode_id(self, opcode: str, operands: List[Tuple]) -> int:
+        """Index of the handler for an instruction. A jump without a known target
+        label never jumps, so it gets the no-op handler."""
+        if opcode in _JUMP_OPCODES and not (operands and operands[0][0] == 'label' and operands[0][2] >= 0):
+            return 0
+        return self._OPCODE_IDS.get(opcode, 0)
+
+    # Instruction handlers. AT&T syntax: src, dest (opposite of Intel).
+    # A handler returns False only when execution should stop.
+
+    def _op_mov(self, operands: List[Tuple]):
+        src, dest = operands[0], operands[1]
+        value = self.get_value(src)
+        self.set_value(dest, value)
+
+    def _op_push(self, operands: List[Tuple]):
+        value = self.get_value(operands[0])
+        self._set_reg(RSP, self.reg[RSP] - 8)
+        self._store(self.reg[RSP], value)
+
+    def _op_pop(self, operands: List[Tuple]):
+        value = self.stack.get(self.reg[RSP], 0)
+        self.set_value(operands[0], value)
+        self._set_reg(RSP, self.reg[RSP] + 8)
+
+    def _read_modify_write(self, operands: List[Tuple], op):
+        """dest = op(dest, src), resolving the destination once. Returns the unmasked result."""
+        src, dest = operands[0], operands[1]
+        val2 = self.get_value(src)
+        kind = dest[0]
+        if kind == 'reg':
+            result = op(self.reg[dest[1]], val2)
+            # Same masking as set_value()
+            self._set_reg(dest[1], result if isinstance(result, float) else result & dest[2])
+        elif kind == 'mem':
+            base = dest[1]
+            addr = (self.reg[base] if base is not None else 0) + dest[2]
+            result = op(self.stack.get(addr, 0), val2)
+            self._store(addr, result)
+        else:
+            result = op(self.get_value(dest), val2)
+        return result
+
+    def _op_add(self, operands: List[Tuple]):
+        # dest = dest + src
+        self._read_modify_write(operands, operator.add)
+
+    def _op_sub(self, operands: List[Tuple]):
+        # dest = dest - src
+        self._read_modify_write(operands, operator.sub)
+
+    def _op_imul(self, operands: List[Tuple]):
+        # dest = dest * src
+        self._read_modify_write(operands, operator.mul)
+
+    def _op_idiv(self, operands: List[Tuple]):
+        divisor = self.get_value(operands[0])
+        if divisor != 0:
+            dividend = self.reg[RAX]
+            self._set_reg(RAX, dividend // divisor)
+            self._set_reg(RDX, dividend % divisor)
+
+    def _op_inc(self, operands: List[Tuple]):
+        val = self.get_value(operands[0])
+        self.set_value(operands[0], val + 1)
+
+    def _op_dec(self, operands: List[Tuple]):
+        val = self.get_value(operands[0])
+        self.set_value(operands[0], val - 1)
+
+    def _op_neg(self, operands: List[Tuple]):
+        val = self.get_value(operands[0])
+        self.set_value(operands[0], -val)
+
+    def _op_cmp(self, operands: List[Tuple]):
+        # Compares dest - src
+        src, dest = operands[0], operands[1]
+        val1 = self.get_value(dest)
+        val2 = self.get_value(src)
+        result = val1 - val2
+        self._set_reg(FLAGS, (self.reg[FLAGS] & OF) | (result == 0) | (result < 0) << 1 | (val1 < val2) << 2)
+
+    def _op_test(self, operands: List[Tuple]):
+        src, dest = operands[0], operands[1]
+        val1 = self.get_value(dest)
+        val2 = self.get_value(src)
+        result = val1 & val2
+        self._set_reg(FLAGS, (self.reg[FLAGS] & (CF | OF)) | (result == 0) | (result < 0) << 1)
+
+    # Jumps. They only run with a resolved target (see _opcode_id), so they set
+    # the instruction pointer directly
+
+    def _jump(self, target: int):
+        # Call targets may be unresolved (e.g. printf)
+        if target >= 0:
+            self.current_instruction = target - 1
+
+    def _op_jmp(self, operands: List[Tuple]):
+        self.current_instruction = operands[0][2] - 1
+
+    def _conditional_jump(condition):
+        """Handler and threaded-code specializer for a jump taken when condition(flags) is 1"""
+        def handler(self, operands: List[Tuple]):
+            if condition(self.reg[FLAGS]):
+                self.current_instruction = operands[0][2] - 1
+
+        def specialize(self, operands: List[Tuple]):
+            target, reg = operands[0][2] - 1, self.reg
+            def jcc():
+                if condition(reg[FLAGS]):
+                    self.current_instruction = target
+            return jcc
+
+        return handler, specialize
+
+    _op_je, _compile_je = _conditional_jump(_cond_e)
+    _op_jne, _compile_jne = _conditional_jump(_cond_ne)
+    _op_jl, _compile_jl = _conditional_jump(_cond_l)
+    _op_jle, _compile_jle = _conditional_jump(_cond_le)
+    _op_jg, _compile_jg = _conditional_jump(_cond_g)
+    _op_jge, _compile_jge = _conditional_jump(_cond_ge)
+    del _conditional_jump
+
+    def _op_call(self, operands: List[Tuple]):
+        target = operands[0]
+        label = target[1]
+        # Push return address
+        self._set_reg(RSP, self.reg[RSP] - 8)
+        self._store(self.reg[RSP], self.current_instruction + 1)
+        self._append(self.call_stack, label)
+
+        # Capture printf output
+        if label == 'printf' or label == 'printf@PLT':
+            # Check if float (num vector args in %eax)
+            num_vector_args = self.reg[RAX]
+
+            if num_vector_args >= 1:
+                value = self.xmm_registers.get('xmm0', 0.0)
+                self._append(self.output, f"{value:.6f}")
+            else:
+                value = self.reg[RSI]
+                # Floats kept in the register are printed unchanged (4294967295.0 is not wrapped to -1.0)
+                if isinstance(value, int):
+                    # Two's complement 64-bit reinterpretation, valid for any int the
+                    # register holds (masked or not); then 32-bit negatives
+                    value = ((value & MASK64) ^ 0x8000000000000000) - 0x8000000000000000
+                    if 0x7FFFFFFF < value <= MASK32:
+                        value -= 0x100000000
+                self._append(self.output, str(value))
+
+        if target[0] == 'label':
+            self._jump(target[2])
+
+    def _op_ret(self, operands: List[Tuple]):
+        if self.call_stack:
+            self._pop(self.call_stack)
+        return_addr = self.stack.get(self.reg[RSP], 0)
+        self._set_reg(RSP, self.reg[RSP] + 8)
+        if return_addr == 0:
+            return False
+        self.current_instruction = return_addr - 1
+
+    def _op_leave(self, operands: List[Tuple]):
+        # mov %rbp, %rsp
+        self._set_reg(RSP, self.reg[RBP])
+        # pop %rbp
+        self._set_reg(RBP, self.stack.get(self.reg[RSP], 0))
+        self._set_reg(RSP, self.reg[RSP] + 8)
+
+    def _op_lea(self, operands: List[Tuple]):
+        src, dest = operands[0], operands[1]
+        # Handle offset(%reg)
+        if src[0] == 'mem':
+            self.set_value(dest, self.get_address(src))
+        # Handle label(%rip)
+        elif src[0] == 'rip':
+            self.set_value(dest, 0x1000)  # Fake address for strings
+
+    # Set instructions
+
+    def _op_setl(self, operands: List[Tuple]):
+        self.set_value(operands[0], _cond_l(self.reg[FLAGS]))
+
+    def _op_setle(self, operands: List[Tuple]):
+        self.set_value(operands[0], _cond_le(self.reg[FLAGS]))
+
+    def _op_setg(self, operands: List[Tuple]):
+        self.set_value(operands[0], _cond_g(self.reg[FLAGS]))
+
+    def _op_setge(self, operands: List[Tuple]):
+        self.set_value(operands[0], _cond_ge(self.reg[FLAGS]))
+
+    def _op_sete(self, operands: List[Tuple]):
+        self.set_value(operands[0], _cond_e(self.reg[FLAGS]))
+
+    def _op_setne(self, operands: List[Tuple]):
+        self.set_value(operands[0], _cond_ne(self.reg[FLAGS]))
+
+    def _op_movzb(self, operands: List[Tuple]):
+        # Move with zero extension (AT&T: movzbq %al, %rax)
+        src, dest = operands[0], operands[1]
+        value = self.get_value(src) & 0xFF
+        self.set_value(dest, value)
+
+    def _op_cqto(self, operands: List[Tuple]):
+        # Sign extension (AT&T name for cqo)
+        if self.reg[RAX] < 0:
+            self._set_reg(RDX, -1)
+        else:
+            self._set_reg(RDX, 0)
+
+    def _op_xor(self, operands: List[Tuple]):
+        result = self._read_modify_write(operands, operator.xor)
+        self._set_reg(FLAGS, (self.reg[FLAGS] & ~ZF) | (result == 0))
+
+    def _op_and(self, operands: List[Tuple]):
+        self._read_modify_write(operands, operator.and_)
+
+    def _op_or(self, operands: List[Tuple]):
+        self._read_modify_write(operands, operator.or_)
+
+    # SSE instructions (simplified)
+
+    def _op_movsd(self, operands: List[Tuple]):
+        src, dest = operands[0], operands[1]
+        val = 0.0
+
+        # Get source value
+        kind = src[0]
+        if kind == 'xmm':
+            val = self.xmm_registers.get(src[1], 0.0)
+        elif kind == 'rip':
+            val = self._data_value(src[1])
+        elif kind == 'imm':
+            val = float(src[1])
+        elif kind == 'mem':
+            # Memory reference like -8(%rbp)
+            val = self.stack.get(self.get_address(src), 0.0)
+        elif kind == 'reg':
+            val = self.reg[src[1]]
+
+        # Store to dest
+        kind = dest[0]
+        if kind == 'xmm':
+            self._write(self.xmm_registers, dest[1], float(val) if not isinstance(val, float) else val)
+        elif kind == 'mem':
+            # Memory reference like -8(%rbp)
+            self._store(self.get_address(dest), val)
+        elif kind == 'reg':  # GPR - preserve float value for simulation purposes
+            self._set_reg(dest[1], val)
+
+    def _data_value(self, label: str) -> float:
+        """Value of a numeric data section entry as a float (0.0 if unknown)"""
+        value = self.data_section.get(label)
+        return float(value) if isinstance(value, (int, float)) else 0.0
+
+    def _op_addsd(self, operands: List[Tuple]):
+        src_reg, dest_reg = operands[0][1], operands[1][1]
+        xmm = self.xmm_registers
+        self._write(xmm, dest_reg, xmm.get(dest_reg, 0.0) + xmm.get(src_reg, 0.0))
+
+    def _op_subsd(self, operands: List[Tuple]):
+        src_reg, dest_reg = operands[0][1], operands[1][1]
+        xmm = self.xmm_registers
+        self._write(xmm, dest_reg, xmm.get(dest_reg, 0.0) - xmm.get(src_reg, 0.0))
+
+    def _op_mulsd(self, operands: List[Tuple]):
+        src_reg, dest_reg = operands[0][1], operands[1][1]
+        xmm = self.xmm_registers
+        self._write(xmm, dest_reg, xmm.get(dest_reg, 0.0) * xmm.get(src_reg, 0.0))
+
+    def _op_divsd(self, operands: List[Tuple]):
+        src_reg, dest_reg = operands[0][1], operands[1][1]
+        xmm = self.xmm_registers
+        val2 = xmm.get(src_reg, 0.0)
+        if val2 != 0:
+            self._write(xmm, dest_reg, xmm.get(dest_reg, 0.0) / val2)
+
+    # Opcode -> handler, looked up once per executed instruction
+    _DISPATCH = {
+        'mov': _op_mov, 'push': _op_push, 'pop': _op_pop,
+        'add': _op_add, 'sub': _op_sub, 'imul': _op_imul, 'idiv': _op_idiv,
+        'inc': _op_inc, 'dec': _op_dec, 'neg': _op_neg,
+        'cmp': _op_cmp, 'test': _op_test,
+        'jmp': _op_jmp, 'je': _op_je, 'jz': _op_je, 'jne': _op_jne, 'jnz': _op_jne,
+        'jl': _op_jl, 'jle': _op_jle, 'jg': _op_jg, 'jge': _op_jge,
+        'call': _op_call, 'ret': _op_ret, 'leave': _op_leave, 'lea': _op_lea,
+        'setl': _op_setl, 'setle': _op_setle, 'setg': _op_setg, 'setge': _op_setge,
+        'sete': _op_sete, 'setz': _op_sete, 'setne': _op_setne,
+        'movzb': _op_movzb, 'cqt': _op_cqto, 'cqto': _op_cqto, 'cltq': _op_cqto,
+        'xor': _op_xor, 'and': _op_and, 'or': _op_or,
+        'movsd': _op_movsd, 'movq': _op_movsd,
+        'addsd': _op_addsd, 'subsd': _op_subsd, 'mulsd': _op_mulsd, 'divsd': _op_divsd,
+    }
+
+    def _op_nop(self, operands: List[Tuple]):
+        # Unknown opcodes are skipped
+        pass
+
+    # Decoded instructions store an opcode id: an index into _HANDLERS (0 = unknown)
+    _HANDLERS = (_op_nop,) + tuple(_DISPATCH.values())
+    _OPCODE_IDS = {opcode: i for i, opcode in enumerate(_DISPATCH, 1)}
+
+    # Threaded code: each decoded instruction is bound into a zero-argument callable
+    # at load time. The most frequent shapes get a closure with the operands baked
+    # in; anything else is its generic handler partially applied.
+
+    def _compile(self, opcode_id: int, operands: List[Tuple]):
+        """Callable executing one decoded instruction (same result as its handler)"""
+        handler = self._HANDLERS[opcode_id]
+        specialize = self._SPECIALIZERS.get(handler)
+        if specialize is not None:
+            compiled = specialize(self, operands)
+            if compiled is not None:
+                return compiled
+        return partial(handler, self, operands)
+
+    def _compile_mov(self, operands: List[Tuple]):
+        if len(operands) < 2:
+            return None
+        src, dest = operands[0], operands[1]
+        reg, stack, set_reg, store = self.reg, self.stack, self._set_reg, self._store
+
+        if src[0] == 'reg' and dest[0] == 'mem' and dest[1] is not None:
+            s, base, offset = src[1], dest[1], dest[2]
+            def mov_reg_mem():
+                store(reg[base] + offset, reg[s])
+            return mov_reg_mem
+
+        if dest[0] != 'reg':
+            return None
+        d, mask = dest[1], dest[2]
+
+        if src[0] == 'imm':
+            # Constant: masked once here
+            value = src[1] if isinstance(src[1], float) else src[1] & mask
+            def mov_imm_reg():
+                set_reg(d, value)
+            return mov_imm_reg
+
+        if src[0] == 'reg':
+            s = src[1]
+            def mov_reg_reg():
+                value = reg[s]
+                set_reg(d, value if isinstance(value, float) else value & mask)
+            return mov_reg_reg
+
+        if src[0] == 'mem' and src[1] is not None:
+            base, offset = src[1], src[2]
+            def mov_mem_reg():
+                value = stack.get(reg[base] + offset, 0)
+                set_reg(d, value if isinstance(value, float) else value & mask)
+            return mov_mem_reg
+
+        return None
+
+    def _compile_push(self, operands: List[Tuple]):
+        if not operands or operands[0][0] != 'reg':
+            return None
+        s = operands[0][1]
+        reg, set_reg, store = self.reg, self._set_reg, self._store
+        def push_reg():
+            value = reg[s]
+            set_reg(RSP, reg[RSP] - 8)
+            store(reg[RSP], value)
+        return push_reg
+
+    def _compile_pop(self, operands: List[Tuple]):
+        if not operands or operands[0][0] != 'reg':
+            return None
+        dest = operands[0]
+        d, mask = dest[1], dest[2]
+        reg, stack, set_reg = self.reg, self.stack, self._set_reg
+        def pop_reg():
+            value = stack.get(reg[RSP], 0)
+            set_reg(d, value if isinstance(value, float) else value & mask)
+            set_reg(RSP, reg[RSP] + 8)
+        return pop_reg
+
+    # Jumps only get here with a resolved target (see _opcode_id); conditional
+    # jumps get their specializer from _conditional_jump
+
+    def _compile_jmp(self, operands: List[Tuple]):
+        target = operands[0][2] - 1
+        def jmp():
+            self.current_instruction = target
+        return jmp
+
+    def _compile_movsd(self, operands: List[Tuple]):
+        # Same as _op_movsd with the operand kinds decided here; a data section
+        # source is constant, so its value is read once
+        if len(operands) < 2:
+            return None
+        src, dest = operands[0], operands[1]
+        reg, stack, xmm = self.reg, self.stack, self.xmm_registers
+        set_reg, store, write = self._set_reg, self._store, self._write
+        src_kind, dest_kind = src[0], dest[0]
+
+        if dest_kind == 'xmm':
+            d = dest[1]
+            if src_kind == 'xmm':
+                s = src[1]
+                def movsd_xmm_xmm():
+                    write(xmm, d, xmm.get(s, 0.0))
+                return movsd_xmm_xmm
+            if src_kind == 'reg':
+                s = src[1]
+                def movq_reg_xmm():
+                    value = reg[s]
+                    write(xmm, d, value if isinstance(value, float) else float(value))
+                return movq_reg_xmm
+            if src_kind == 'mem' and src[1] is not None:
+                base, offset = src[1], src[2]
+                def movsd_mem_xmm():
+                    value = stack.get(reg[base] + offset, 0.0)
+                    write(xmm, d, value if isinstance(value, float) else float(value))
+                return movsd_mem_xmm
+            if src_kind in ('rip', 'imm'):
+                value = self._data_value(src[1]) if src_kind == 'rip' else float(src[1])
+                def movsd_const_xmm():
+                    write(xmm, d, value)
+                return movsd_const_xmm
+            return None
+
+        if src_kind != 'xmm':
+            return None
+        s = src[1]
+        if dest_kind == 'reg':
+            d = dest[1]
+            def movq_xmm_reg():
+                set_reg(d, xmm.get(s, 0.0))
+            return movq_xmm_reg
+        if dest_kind == 'mem' and dest[1] is not None:
+            base, offset = dest[1], dest[2]
+            def movsd_xmm_mem():
+                store(reg[base] + offset, xmm.get(s, 0.0))
+            return movsd_xmm_mem
+        return None
+
+    # Handler -> function returning a specialized callable, or None for the generic one
+    _SPECIALIZERS = {
+        _op_mov: _compile_mov, _op_push: _compile_push, _op_pop: _compile_pop,
+        _op_jmp: _compile_jmp, _op_je: _compile_je, _op_jne: _compile_jne,
+        _op_jl: _compile_jl, _op_jle: _compile_jle, _op_jg: _compile_jg, _op_jge: _compile_jge,
+        _op_movsd: _compile_movsd,
+    }
 
     def step(self) -> bool:
         """Execute one instruction. Returns False if execution finished."""
@@ -578,8 +981,7 @@ class X86Simulator:
 
         self.save_state()
 
-        instruction = self.instructions[self.current_instruction]
-        should_continue = self.execute_instruction(instruction)
+        should_continue = self.compiled[self.current_instruction]() is not False
 
         self.current_instruction += 1
 
@@ -587,39 +989,133 @@ class X86Simulator:
 
     def step_back(self) -> bool:
         """Step back one instruction"""
-        return self.restore_state()
+        if self.history:
+            return self.restore_state()
+        return self._rebuild_previous_state()
 
     def run_until_breakpoint(self, breakpoint_line: int = -1) -> bool:
-        """Run until breakpoint or end"""
-        while self.current_instruction < len(self.instructions):
-            if self.current_instruction == breakpoint_line:
-                return True
-            if not self.step():
-                return False
-        return False
+        """Run until breakpoint or end (without per-step history, see run_to()).
+        Returns True if stopped at the breakpoint."""
+        return self._run(breakpoint_line, sys.maxsize)[1]
+
+    def run_to(self, breakpoint_line: int = -1, max_steps: int = 10000) -> int:
+        """Run until breakpoint_line, the end of the program or max_steps steps.
+        Returns the number of steps executed.
+
+        Unlike step(), no per-step undo records are kept: the whole run is one
+        history entry (a snapshot of the state before it), so step_back undoes
+        it at once. The periodic checkpoints are still taken.
+        """
+        return self._run(breakpoint_line, max_steps)[0]
+
+    def _run(self, breakpoint_line: int, max_steps: int) -> Tuple[int, bool]:
+        """Loop behind run_to(): returns (steps executed, stopped at breakpoint_line)"""
+        compiled = self.compiled
+        end = len(compiled)
+        steps = 0
+        at_breakpoint = False
+
+        before = self._snapshot()
+        before['step_count'] = self.step_count
+        self._undo = _NO_UNDO
+        raised = True
+        try:
+            while steps < max_steps and self.current_instruction < end:
+                if self.current_instruction == breakpoint_line:
+                    at_breakpoint = True
+                    break
+                self._checkpoint()
+                should_continue = compiled[self.current_instruction]() is not False
+                self.current_instruction += 1
+                self.step_count += 1
+                steps += 1
+                if not should_continue:
+                    break
+            raised = False
+        finally:
+            self._undo = []
+            # Also when a handler raised, even on the first instruction: its
+            # partial writes are undone together with the run
+            if steps or raised:
+                self.history.append((before['current_instruction'], before))
+                self._invalidate_deltas()
+        return steps, at_breakpoint
+
+    def _position_state(self) -> Dict[str, Any]:
+        """Small per-step fields shared by get_state() and get_state_delta()"""
+        in_program = self.current_instruction < len(self.instructions)
+        return {
+            'seq': self.state_seq,
+            'current_instruction': self.current_instruction,
+            'current_line_number': self.instruction_lines[self.current_instruction] if in_program else -1,
+            'instruction': self.instructions[self.current_instruction] if in_program else 'END',
+            'call_stack': self.call_stack,
+            'can_step_back': self.step_count > 0,
+            'can_step_forward': in_program,
+        }
 
     def get_state(self) -> Dict[str, Any]:
-        """Get current execution state for visualization"""
+        """Get current execution state for visualization.
+
+        Built once per state_seq: repeated calls without a step in between
+        (UI polling) return the same, read-only, dict.
+        """
+        cache = self._state_cache
+        if cache is not None and cache[0] == self.state_seq:
+            return cache[1]
+
         stack_view = []
-        for addr in sorted(self.stack.keys(), reverse=True):
+        for addr in reversed(self._stack_addrs):
             stack_view.append({
                 'address': hex(addr),
                 'value': self.stack[addr],
-                'is_rbp': addr == self.registers['rbp'],
-                'is_rsp': addr == self.registers['rsp'],
-                'rbp_offset': addr - self.registers['rbp'] if self.registers['rbp'] != 0 else None
+                'is_rbp': addr == self.reg[RBP],
+                'is_rsp': addr == self.reg[RSP],
+                'rbp_offset': addr - self.reg[RBP] if self.reg[RBP] != 0 else None
             })
 
-        return {
-            'registers': {k: hex(v) if isinstance(v, int) else v for k, v in self.registers.items()},
+        state = {
+            'registers': {k: _format_register(v) for k, v in zip(REG_NAMES, self.reg)},
             'xmm_registers': self.xmm_registers,
             'flags': self.flags,
             'stack': stack_view,
-            'current_instruction': self.current_instruction,
-            'current_line_number': self.instruction_lines[self.current_instruction] if self.current_instruction < len(self.instructions) else -1,
-            'instruction': self.instructions[self.current_instruction] if self.current_instruction < len(self.instructions) else 'END',
-            'call_stack': self.call_stack,
-            'can_step_back': len(self.history) > 0,
-            'can_step_forward': self.current_instruction < len(self.instructions),
-            'output': self.output
+            'output': self.output,
+            **self._position_state()
+        }
+        self._state_cache = (self.state_seq, state)
+        return state
+
+    def get_state_delta(self, since_seq: int) -> Optional[Dict[str, Any]]:
+        """Get only what changed since the state numbered since_seq.
+
+        Built from the undo records of the steps taken since then. Returns None
+        when that is not possible (the caller is too far behind, or the state
+        was stepped back or reset meanwhile) and a full get_state() is needed.
+        Stack entries carry only address and value; rsp/rbp markers are left
+        to the client since they follow from the registers.
+        """
+        steps = self.state_seq - since_seq
+        if since_seq < self._delta_base_seq or steps < 0 or steps > len(self.history):
+            return None
+
+        regs, xmm, stack = set(), set(), set()
+        appended = 0
+        for _, record in islice(self.history, len(self.history) - steps, None):
+            for target, key, _ in record:
+                if target is self.reg:
+                    regs.add(key)
+                elif target is self.stack:
+                    stack.add(key)
+                elif target is self.xmm_registers:
+                    xmm.add(key)
+                elif target is self.output:
+                    appended += 1
+
+        return {
+            'registers': {REG_NAMES[i]: _format_register(self.reg[i]) for i in regs if i != FLAGS},
+            'xmm_registers': {k: self.xmm_registers[k] for k in xmm},
+            'flags': self.flags if FLAGS in regs else {},
+            'stack': [{'address': hex(addr), 'value': self.stack[addr]} for addr in stack],
+            'output_appended': self.output[len(self.output) - appended:] if appended else [],
+            **self._position_state()
         }
@@ -163,13 +163,16 @@ async function stepForward() {
         const response = await fetch(`${API_BASE}/step`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ session_id: SESSION_ID })
+            body: JSON.stringify({
+                session_id: SESSION_ID,
+                since_seq: previousState ? previousState.seq : null
+            })
         });
 
         const data = await response.json();
 
         if (data.success) {
-            updateUI(data.state);
+            updateUI(data.delta ? applyDelta(previousState, data.delta) : data.state);
 
             if (!data.can_continue) {
                 setStatus('Execution completed!', 'success');
@@ -305,6 +308,41 @@ function updateUI(state) {
     previousState = state;
 }
 
+// Build the full state from the previous one plus a /step delta
+function applyDelta(state, delta) {
+    const registers = Object.assign({}, state.registers, delta.registers);
+    const values = new Map(state.stack.map(item => [item.address, item.value]));
+    delta.stack.forEach(item => values.set(item.address, item.value));
+
+    const rbp = parseInt(registers.rbp, 16);
+    const rsp = parseInt(registers.rsp, 16);
+    const stack = Array.from(values.keys())
+        .map(address => ({ address, addr: parseInt(address, 16) }))
+        .sort((a, b) => b.addr - a.addr)
+        .map(({ address, addr }) => ({
+            address,
+            value: values.get(address),
+            is_rbp: addr === rbp,
+            is_rsp: addr === rsp,
+            rbp_offset: rbp !== 0 ? addr - rbp : null
+        }));
+
+    return {
+        registers,
+        xmm_registers: Object.assign({}, state.xmm_registers, delta.xmm_registers),
+        flags: Object.assign({}, state.flags, delta.flags),
+        stack,
+        output: state.output.concat(delta.output_appended),
+        seq: delta.seq,
+        current_instruction: delta.current_instruction,
+        current_line_number: delta.current_line_number,
+        instruction: delta.instruction,
+        call_stack: delta.call_stack,
+        can_step_back: delta.can_step_back,
+        can_step_forward: delta.can_step_forward
+    };
+}
+
 // Update Registers Display
 function updateRegisters(registers) {
     const importantRegs = ['rax', 'rbx', 'rcx', 'rdx', 'rsi', 'rdi', 'rbp', 'rsp',
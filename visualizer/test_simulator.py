@@ -0,0 +1,184 @@
+"""
+Regression tests for the simulator's step loop, step-back history and delta protocol.
+
+The tests/*.c programs are compiled with ../compiler and stepped one instruction at a
+time; step_back, run_to and get_state_delta must reproduce the states seen on the way.
+
+    cd visualizer && python -m unittest test_simulator
+"""
+
+import glob
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import simulator
+from simulator import X86Simulator
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+COMPILER_PATH = os.path.join(ROOT, 'compiler')
+PROGRAMS = sorted(glob.glob(os.path.join(ROOT, 'tests', '*.c')))
+
+# printf output of each program (same as the native binary)
+EXPECTED_OUTPUT = {
+    'test_base1.c': ['30', '10', '200', '2'],
+    'test_base2.c': ['10', '1'],
+    'test_base3.c': ['45'],
+    'test_base4.c': ['45'],
+    'test_base5.c': ['11', '16', '4'],
+    'test_ext1.c': ['10', '5'],
+    'test_ext2.c': ['150'],
+    'test_ext3.c': ['3000000'],
+    'test_ext4.c': ['6.280000'],
+    'test_ext5.c': ['30', '1000000', '3.140000'],
+    'test_func1.c': ['15'],
+    'test_func2.c': ['49'],
+    'test_func3.c': ['120'],
+    'test_opt1.c': ['6', '50', '25'],
+    'test_opt2.c': ['30'],
+    'test_opt3.c': ['16', '32'],
+    'test_opt4.c': ['16'],
+    'test_opt5.c': ['100'],
+}
+
+_assembly_cache = {}
+
+def compile_program(path):
+    """Assembly generated by the compiler for a C file (compiled once per run)"""
+    if path not in _assembly_cache:
+        with tempfile.TemporaryDirectory() as tmp:
+            asm_file = os.path.join(tmp, 'out.s')
+            subprocess.run([COMPILER_PATH, path, '-o', asm_file], capture_output=True, check=True)
+            with open(asm_file) as f:
+                _assembly_cache[path] = f.read()
+    return _assembly_cache[path]
+
+def load(path):
+    sim = X86Simulator()
+    sim.load_assembly(compile_program(path))
+    return sim
+
+def observed(sim):
+    """get_state() as the client sees it, without the sequence number"""
+    state = json.loads(json.dumps(sim.get_state()))
+    del state['seq']
+    return state
+
+def trace(path):
+    """States after 0, 1, 2, ... single steps until the program stops"""
+    sim = load(path)
+    states = [observed(sim)]
+    running = True
+    while running:
+        running = sim.step()
+        states.append(observed(sim))
+    return states
+
+def apply_delta(state, delta):
+    """Patch a client-side state with a get_state_delta() result, as app.js does"""
+    state = json.loads(json.dumps(state))
+    state['registers'].update(delta['registers'])
+    state['xmm_registers'].update(delta['xmm_registers'])
+    state['flags'].update(delta['flags'])
+    values = {entry['address']: entry['value'] for entry in state['stack']}
+    for entry in delta['stack']:
+        values[entry['address']] = entry['value']
+    rbp = int(state['registers']['rbp'], 16)
+    rsp = int(state['registers']['rsp'], 16)
+    state['stack'] = [{
+        'address': address,
+        'value': values[address],
+        'is_rbp': int(address, 16) == rbp,
+        'is_rsp': int(address, 16) == rsp,
+        'rbp_offset': int(address, 16) - rbp if rbp != 0 else None
+    } for address in sorted(values, key=lambda a: int(a, 16), reverse=True)]
+    state['output'] = state['output'] + delta['output_appended']
+    for key in ('seq', 'current_instruction', 'current_line_number', 'instruction',
+                'call_stack', 'can_step_back', 'can_step_forward'):
+        state[key] = delta[key]
+    return state
+
+@unittest.skipUnless(os.path.exists(COMPILER_PATH), 'compiler not built (run make)')
+class SimulatorTest(unittest.TestCase):
+
+    def test_programs_output(self):
+        self.assertEqual(sorted(EXPECTED_OUTPUT), [os.path.basename(p) for p in PROGRAMS])
+        for path in PROGRAMS:
+            with self.subTest(program=os.path.basename(path)):
+                sim = load(path)
+                sim.run_to(max_steps=100000)
+                self.assertEqual(sim.output, EXPECTED_OUTPUT[os.path.basename(path)])
+
+    def test_step_matches_run_to(self):
+        for path in PROGRAMS:
+            states = trace(path)
+            sim = load(path)
+            steps = 0
+            for count in (1, 2, 5, 13, 40):
+                steps += sim.run_to(max_steps=count)
+                with self.subTest(program=os.path.basename(path), steps=steps):
+                    self.assertEqual(observed(sim), states[min(steps, len(states) - 1)])
+
+    def test_step_back(self):
+        # History limit 0 rebuilds every step back from the checkpoints; with
+        # checkpoints every 4 steps the longer programs also get them thinned
+        for limit, checkpoint_every in ((256, 64), (5, 64), (0, 64), (0, 4)):
+            for path in PROGRAMS:
+                with self.subTest(program=os.path.basename(path), limit=limit, checkpoint_every=checkpoint_every), \
+                        mock.patch.object(simulator, 'CHECKPOINT_EVERY', checkpoint_every):
+                    states = trace(path)
+                    sim = load(path)
+                    sim.set_history_limit(limit)
+                    while sim.step():
+                        pass
+                    self.assertLessEqual(len(sim.checkpoints), simulator.CHECKPOINT_MAX)
+                    for expected in reversed(states[:-1]):
+                        self.assertTrue(sim.step_back())
+                        self.assertEqual(observed(sim), expected)
+                    self.assertFalse(sim.step_back())
+
+    def test_run_to_step_back(self):
+        for path in PROGRAMS:
+            states = trace(path)
+            for start in (0, len(states) // 3):
+                with self.subTest(program=os.path.basename(path), start=start):
+                    sim = load(path)
+                    for _ in range(start):
+                        sim.step()
+                    sim.run_to(max_steps=100000)
+                    self.assertEqual(observed(sim), states[-1])
+                    # The whole run is undone at once, then single steps again
+                    self.assertTrue(sim.step_back())
+                    self.assertEqual(observed(sim), states[start])
+                    if start:
+                        self.assertTrue(sim.step_back())
+                        self.assertEqual(observed(sim), states[start - 1])
+
+    def test_state_delta(self):
+        for path in PROGRAMS:
+            with self.subTest(program=os.path.basename(path)):
+                sim = load(path)
+                client = json.loads(json.dumps(sim.get_state()))
+                step = 0
+                running = True
+                while running:
+                    step += 1
+                    running = sim.step()
+                    if step % 7 == 0:
+                        # After a step back only a full state will do
+                        sim.step_back()
+                        self.assertIsNone(sim.get_state_delta(client['seq']))
+                        client = json.loads(json.dumps(sim.get_state()))
+                        continue
+                    if step % 5 == 0 and running:
+                        continue  # skip a poll: the next delta covers two steps
+                    delta = sim.get_state_delta(client['seq'])
+                    self.assertIsNotNone(delta)
+                    client = apply_delta(client, json.loads(json.dumps(delta)))
+                    self.assertEqual(client, json.loads(json.dumps(sim.get_state())))
+
+if __name__ == '__main__':
+    unittest.main()